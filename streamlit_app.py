@@ -1,60 +1,246 @@
 import streamlit as st
 import pandas as pd
-import statsmodels.api as sm
 import numpy as np
+import functools
+import io
 import itertools
+import xlsxwriter
 import warnings
 import os
 import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from scipy import linalg, stats
+
+try:
+    import numba
+except ImportError:  # pure-NumPy batched solve is used instead
+    numba = None
 
 # Suppress warnings about future changes
 warnings.simplefilter(action='ignore', category=FutureWarning)
 warnings.simplefilter(action='ignore', category=UserWarning)
 
-# Predefined year selections
+# Predefined year selections (immutable, built once at import)
 predefined_years = {
-    "2001-2023": list(range(2001, 2024)),
-    "2005 - 2023 excluding 2009, 2016": [year for year in range(2005, 2024) if year not in {2009, 2016}],
-    "2001-2023 excluding 2020, 2021, 2022": [year for year in range(2001, 2024) if year not in {2020, 2021, 2022}],
-    "2001-2019": list(range(2001, 2020)),
-    "2001-2023 excluding 2009, 2013, 2020, 2021, 2022": [
+    "2001-2023": tuple(range(2001, 2024)),
+    "2005 - 2023 excluding 2009, 2016": tuple(year for year in range(2005, 2024) if year not in {2009, 2016}),
+    "2001-2023 excluding 2020, 2021, 2022": tuple(year for year in range(2001, 2024) if year not in {2020, 2021, 2022}),
+    "2001-2019": tuple(range(2001, 2020)),
+    "2001-2023 excluding 2009, 2013, 2020, 2021, 2022": tuple(
         year for year in range(2001, 2024) if year not in {2009, 2013, 2020, 2021, 2022}
-    ]
+    )
 }
 
-def run_single_regression(df, y_var, x_vars):
-    Y = df[y_var].astype(float)
-    X = df[x_vars].astype(float)
-    X = sm.add_constant(X)
-    model = sm.OLS(Y, X).fit()
-    return model
+if numba is not None:
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def solve_batch(Gs, bs):
+        # Tight numeric kernel: solve every (r+1)x(r+1) system in the
+        # stack on its own core, with no Python objects in the loop.
+        betas = np.empty_like(bs)
+        for k in numba.prange(bs.shape[0]):
+            betas[k] = np.linalg.solve(Gs[k], bs[k])
+        return betas
+else:
+    def solve_batch(Gs, bs):
+        return np.linalg.solve(Gs, bs[:, :, None])[:, :, 0]
+
+
+@st.cache_data
+def load_excel(data):
+    """Parse the uploaded workbook once; keyed on the raw file bytes.
+
+    Streamlit reruns the whole script on every widget interaction, so
+    without the cache the (slow) Excel parse would repeat on each rerun.
+    The numeric columns are converted to contiguous float64 arrays here
+    too, so the regression path never redoes per-run dtype coercion.
+    """
+    try:
+        # calamine parses the workbook natively, ~10x faster than openpyxl
+        df = pd.read_excel(io.BytesIO(data), sheet_name="Sheet1", engine="calamine")
+    except (ImportError, ValueError):
+        df = pd.read_excel(io.BytesIO(data), sheet_name="Sheet1")
+    y_all = df.iloc[:, 1].to_numpy(np.float64)
+    x_all = df.iloc[:, 2:].to_numpy(np.float64)
+    year_all = df['Year'].to_numpy(np.int64) if 'Year' in df.columns else None
+    return df, y_all, x_all, year_all
+
+
+def build_scenario_xlsx(summary_data):
+    """Render one scenario's summary rows to xlsx bytes.
+
+    Streams rows straight into xlsxwriter with a bounded row buffer
+    (constant_memory) instead of routing a DataFrame through
+    pd.ExcelWriter and a temp file on disk.
+    """
+    buffer = io.BytesIO()
+    workbook = xlsxwriter.Workbook(buffer, {'constant_memory': True})
+    worksheet = workbook.add_worksheet("Sheet1")
+    num_format = workbook.add_format({'num_format': '0.0000'})
+    for row_ix, row in enumerate(summary_data):
+        for col_ix, cell in enumerate(row):
+            try:
+                value = float(cell)
+            except (TypeError, ValueError):
+                value = None
+            if value is None or not np.isfinite(value):
+                # covers text cells plus the 'nan' fillers in the ANOVA block
+                worksheet.write(row_ix, col_ix, '' if cell is None else str(cell))
+            else:
+                # Let Excel handle display formatting of numeric cells.
+                worksheet.write_number(row_ix, col_ix, value,
+                                       None if value.is_integer() else num_format)
+    workbook.close()
+    return buffer.getvalue()
+
+
+def subset_index_matrix(num_vars, r):
+    """All C(p, r) variable subsets of size r as rows of Gram-matrix indices.
+
+    Row k is ``[0, i1, ..., ir]`` — the constant column plus the 1-based
+    positions of the subset's variables in the full Gram matrix.
+    """
+    combos = np.fromiter(
+        itertools.chain.from_iterable(itertools.combinations(range(1, num_vars + 1), r)),
+        dtype=np.intp).reshape(-1, r)
+    return np.hstack([np.zeros((combos.shape[0], 1), dtype=np.intp), combos])
+
+
+def _limit_blas_threads():
+    # Each worker process gets one core's worth of scenario work; keep the
+    # BLAS inside it single-threaded so workers don't oversubscribe cores.
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = "1"
+
+
+def process_scenario(scenario_name, years, y, X_full, variables, y_col):
+    """Fit every variable combination for one scenario.
+
+    Module-level and fed plain NumPy arrays so it is picklable and can run
+    in a worker process. Returns (scenario_name, scenario_results) where
+    scenario_results is a struct-of-arrays dict: one row per model in each
+    statistic array, with coefficient rows NaN-padded to p+1 columns,
+    rather than a list of per-model objects.
+    """
+    n = y.shape[0]
+    p = len(variables)
+    X_full_c = np.column_stack([np.ones(n), X_full])
+    XtX_full = X_full_c.T @ X_full_c
+    Xty_full = X_full_c.T @ y
+    yty = y @ y
+    sst = yty - y.sum() ** 2 / n
+
+    num_models = (1 << p) - 1
+    scenario_results = {
+        'years': list(years),
+        'y_col': y_col,
+        'nobs': n,
+        'x_vars': [None] * num_models,
+        'params': np.full((num_models, p + 1), np.nan),
+        'bse': np.full((num_models, p + 1), np.nan),
+        'tvalues': np.full((num_models, p + 1), np.nan),
+        'pvalues': np.full((num_models, p + 1), np.nan),
+        'ci_low': np.full((num_models, p + 1), np.nan),
+        'ci_high': np.full((num_models, p + 1), np.nan),
+        'rsquared': np.empty(num_models),
+        'rsquared_adj': np.empty(num_models),
+        'scale': np.empty(num_models),
+        'ssr': np.empty(num_models),
+        'ess': np.empty(num_models),
+        'df_model': np.empty(num_models, dtype=np.intp),
+        'df_resid': np.empty(num_models, dtype=np.intp),
+        'f_pvalue': np.empty(num_models),
+    }
+
+    # For each subset size r, gather all C(p, r) sub-Gram matrices into one
+    # (K, r+1, r+1) stack and solve every model of that size with a single
+    # batched LAPACK call.
+    row = 0
+    for r in range(1, p + 1):
+        full_idx = subset_index_matrix(p, r)
+        Gs = XtX_full[full_idx[:, :, None], full_idx[:, None, :]]
+        bs = Xty_full[full_idx]
+        try:
+            betas = solve_batch(Gs, bs)
+        except (np.linalg.LinAlgError, SystemError):
+            # numba re-raises LinAlgError from inside prange as SystemError
+            betas = np.full_like(bs, np.nan)
+        # Normal equations square the condition number; re-solve any subset
+        # they mishandled directly from the design columns with a
+        # rank-revealing LAPACK least-squares driver.
+        for k in np.flatnonzero(~np.isfinite(betas).all(axis=1)):
+            betas[k] = linalg.lstsq(X_full_c[:, full_idx[k]], y,
+                                    lapack_driver='gelsy', check_finite=False)[0]
+
+        # All remaining statistics are array expressions over the batch:
+        # one einsum for the residual sums of squares, one batched inverse
+        # for the standard errors, one SciPy call per distribution.
+        dfr, dfe = r, n - r - 1
+        ssr = np.maximum(yty - np.einsum('ki,ki->k', betas, bs), 0.0)
+        ess = sst - ssr
+        rsquared = 1.0 - ssr / sst
+        scale = ssr / dfe
+        try:
+            inv_Gs = np.linalg.inv(Gs)
+        except np.linalg.LinAlgError:
+            inv_Gs = np.stack([np.linalg.pinv(G) for G in Gs])
+        bse = np.sqrt(scale[:, None] * np.diagonal(inv_Gs, axis1=1, axis2=2))
+        tvalues = betas / bse
+        t_crit = stats.t.ppf(0.975, dfe)
+
+        batch = slice(row, row + full_idx.shape[0])
+        width = r + 1
+        scenario_results['params'][batch, :width] = betas
+        scenario_results['bse'][batch, :width] = bse
+        scenario_results['tvalues'][batch, :width] = tvalues
+        scenario_results['pvalues'][batch, :width] = 2.0 * stats.t.sf(np.abs(tvalues), dfe)
+        scenario_results['ci_low'][batch, :width] = betas - t_crit * bse
+        scenario_results['ci_high'][batch, :width] = betas + t_crit * bse
+        scenario_results['rsquared'][batch] = rsquared
+        scenario_results['rsquared_adj'][batch] = 1.0 - (1.0 - rsquared) * (n - 1) / dfe
+        scenario_results['scale'][batch] = scale
+        scenario_results['ssr'][batch] = ssr
+        scenario_results['ess'][batch] = ess
+        scenario_results['df_model'][batch] = dfr
+        scenario_results['df_resid'][batch] = dfe
+        scenario_results['f_pvalue'][batch] = stats.f.sf((ess / dfr) / scale, dfr, dfe)
+        for k in range(full_idx.shape[0]):
+            scenario_results['x_vars'][row] = tuple(variables[c - 1] for c in full_idx[k, 1:])
+            row += 1
+    return scenario_name, scenario_results
 
 class RegressionApp:
     def __init__(self):
         self.df = None
-        self.variables = []
         self.scenarios = dict(predefined_years)
         self.num_combinations = 0
         self.total_regressions = 0
         self.completed_regressions = 0
         self.start_time = None
 
+    @functools.cached_property
+    def variables(self):
+        return tuple(self.df.columns[2:])
+
     def choose_file(self):
         file = st.file_uploader("Upload Excel file", type=["xlsx"])
         if file:
-            self.df = pd.read_excel(file, sheet_name="Sheet1")
-            self.variables = self.df.columns[2:].tolist()
+            df, y_all, x_all, year_all = load_excel(file.getvalue())
+            self.df = df
+            st.session_state["df"] = df
+            st.session_state["Y_all"] = y_all
+            st.session_state["X_all"] = x_all
+            st.session_state["year_all"] = year_all
             st.write("### Columns in the uploaded file:")
             st.write(self.df.columns.tolist())
+        elif "df" in st.session_state:
+            self.df = st.session_state["df"]
 
     def show_variable_selection(self):
         if self.df is None:
             st.warning("Please upload an Excel file first.")
             return
 
-        self.variables = self.df.columns[2:].tolist()
-        self.num_combinations = sum(
-            [len(list(itertools.combinations(self.variables, i))) for i in range(1, len(self.variables) + 1)])
+        self.num_combinations = (1 << len(self.variables)) - 1
         self.total_regressions = len(self.scenarios) * self.num_combinations
 
         if self.total_regressions == 0:
@@ -68,13 +254,13 @@ class RegressionApp:
                 st.write(f"- {var}")
 
     def display_scenarios(self):
-        all_years = list(range(2001, 2024))
-        scenario_df = pd.DataFrame(columns=all_years)
-
-        for name, years in self.scenarios.items():
-            scenario_df.loc[name] = ['•' if year in years else '' for year in all_years]
-
-        st.table(scenario_df.T)
+        # Build the years-by-scenarios table in its display orientation
+        # directly; no row-by-row .loc growth and no transpose copy.
+        all_years = np.arange(2001, 2024)
+        marks = np.empty((len(self.scenarios), all_years.size), dtype=object)
+        for i, years in enumerate(self.scenarios.values()):
+            marks[i] = np.where(np.isin(all_years, np.fromiter(years, int)), '•', '')
+        st.table(pd.DataFrame(marks.T, index=all_years, columns=list(self.scenarios)))
 
     def run_regression_scenarios(self):
         if self.df is None:
@@ -85,34 +271,66 @@ class RegressionApp:
             st.error("The 'Year' column is missing from the uploaded file.")
             return
 
-        all_results = []
         self.start_time = time.time()
         progress_bar = st.progress(0)
         progress_text = st.empty()
 
+        y_col = self.df.columns[1]
+        variables = self.variables
+        # Progress state is owned by the main thread only: workers never
+        # touch the counters or the progress widgets, and the counters are
+        # reset here so repeated runs don't accumulate.
+        self.num_combinations = (1 << len(variables)) - 1
+        self.total_regressions = len(self.scenarios) * self.num_combinations
+        self.completed_regressions = 0
+        # Scenario filtering is a boolean mask over the cached float64
+        # arrays — no per-scenario pandas indexing or dtype coercion. Masks
+        # are keyed on the frozenset of years so scenarios that share a
+        # year selection reuse the same mask, all computed before dispatch.
+        y_all = st.session_state["Y_all"]
+        x_all = st.session_state["X_all"]
+        year_all = st.session_state["year_all"]
+        mask_cache = {}
+        jobs = []
         for scenario_name, years in self.scenarios.items():
-            df_selected = self.df[self.df['Year'].isin(years)]
-            variables = self.df.columns[2:].tolist()
-            combinations = list(itertools.chain.from_iterable(
-                itertools.combinations(variables, r) for r in range(1, len(variables) + 1)
-            ))
-
-            scenario_results = []
-            for idx, selected_x_vars in enumerate(combinations, start=1):
-                model = run_single_regression(df_selected, self.df.columns[1], list(selected_x_vars))
-                output_df = self.format_regression_output(model)
-                if output_df.empty:
-                    st.warning(f"Could not compute output for model with variables {selected_x_vars}")
-                    continue
-                anova_table = self.calculate_anova_table(model)
-                scenario_results.append(
-                    (output_df, years, self.df.columns[1], model, anova_table, selected_x_vars, idx))
-                self.completed_regressions += 1
+            key = frozenset(years)
+            mask = mask_cache.get(key)
+            if mask is None:
+                mask = np.isin(year_all, np.fromiter(years, dtype=year_all.dtype))
+                mask_cache[key] = mask
+            jobs.append((scenario_name, years, y_all[mask], x_all[mask]))
+
+        # The per-scenario work is CPU-bound, so run each scenario in its
+        # own process; workers only receive/return picklable arrays and
+        # plain result objects, never live widgets.
+        results_by_name = {}
+        summary_rows_by_name = {}
+        writer_futures = {}
+        with ProcessPoolExecutor(max_workers=min(len(jobs), os.cpu_count() or 1),
+                                 initializer=_limit_blas_threads) as executor, \
+                ThreadPoolExecutor(max_workers=2) as writer_pool:
+            futures = [executor.submit(process_scenario, name, years, y, X, variables, y_col)
+                       for name, years, y, X in jobs]
+            for future in as_completed(futures):
+                scenario_name, scenario_results = future.result()
+                results_by_name[scenario_name] = scenario_results
+                # Hand the finished scenario's workbook build to a writer
+                # thread so the xlsx rendering overlaps the regressions
+                # still running in the other workers.
+                rows = self._build_summary_rows(scenario_results)
+                summary_rows_by_name[scenario_name] = rows
+                writer_futures[scenario_name] = writer_pool.submit(build_scenario_xlsx, rows)
+                self.completed_regressions += len(scenario_results['x_vars'])
                 self.update_progress(progress_bar, progress_text)
+            xlsx_by_name = {name: f.result() for name, f in writer_futures.items()}
 
-            all_results.append((scenario_name, scenario_results))
+        all_results = [(name, results_by_name[name]) for name in self.scenarios]
 
         st.session_state["results"] = all_results
+        # Build the display/export rows once per scenario; every consumer
+        # (on-screen tables, clipboard, Excel export) reads these caches.
+        st.session_state["summary_rows"] = summary_rows_by_name
+        st.session_state["xlsx_bytes"] = xlsx_by_name
 
     def update_progress(self, progress_bar, progress_text):
         if self.total_regressions > 0:
@@ -129,95 +347,92 @@ class RegressionApp:
             progress_bar.progress(0)
             progress_text.text("No regressions to run.")
 
+    def _build_summary_rows(self, scenario_results):
+        res = scenario_results
+        years_text = ', '.join(map(str, res['years']))
+
+        def coeff_cells(row, col):
+            return [str(res[field][row, col]) for field in
+                    ('params', 'bse', 'tvalues', 'pvalues', 'ci_low', 'ci_high')]
+
+        summary_data = []
+        for row, x_vars in enumerate(res['x_vars']):
+            idx = row + 1
+            summary_data.append(['', 'Selected Years', years_text])
+            summary_data.append(['', 'SUMMARY OUTPUT', ''])
+            summary_data.append(['', 'Regression Statistics', ''])
+            summary_data.append(['', 'Multiple R', f"{res['rsquared'][row] ** 0.5:.4f}"])
+            summary_data.append([f"S{idx}R^2", 'R Square', f"{res['rsquared'][row]:.4f}"])
+            summary_data.append(['', 'Adjusted R Square', f"{res['rsquared_adj'][row]:.4f}"])
+            summary_data.append([f"S{idx}SE", 'Standard Error of the Regression',
+                                 f"{res['scale'][row] ** 0.5:.4f}"])
+            summary_data.append(['', 'Observations', f"{res['nobs']}"])
+            summary_data.append(['', 'ANOVA', ''])
+            summary_data.append(['', '', 'df', 'SS', 'MS', 'F', 'Significance F'])
+            dfr, dfe = res['df_model'][row], res['df_resid'][row]
+            ess, sse = res['ess'][row], res['ssr'][row]
+            msr, mse = ess / dfr, sse / dfe
+            summary_data.append(['', 'Regression', str(dfr), str(ess), str(msr),
+                                 str(msr / mse), f"{res['f_pvalue'][row]:.4f}"])
+            summary_data.append(['', 'Residual', str(dfe), str(sse), str(mse), 'nan', 'nan'])
+            summary_data.append(['', 'Total', str(dfr + dfe), str(ess + sse), 'nan', 'nan', 'nan'])
+
+            summary_data.append(
+                ['', '', 'Coefficients', 'Standard Error', 't Stat', 'P-value', 'Lower 95%', 'Upper 95%'])
+            summary_data.append([f"S{idx}Const", 'const'] + coeff_cells(row, 0))
+            pos = {var: i + 1 for i, var in enumerate(x_vars)}
+            for i, var in enumerate(sorted(x_vars), start=1):
+                summary_data.append([f"S{idx}X{i}", var] + coeff_cells(row, pos[var]))
+        return summary_data
+
+    @st.fragment
     def display_results_page(self):
+        # Interactions inside the results tabs (clipboard/export buttons)
+        # rerun only this fragment, not the upload/scenario sections above.
         if "results" not in st.session_state:
             st.write("No results to display. Please run the regression scenarios first.")
             return
 
         all_results = st.session_state["results"]
+        summary_rows = st.session_state.get("summary_rows", {})
         num_tabs = min(5, len(all_results))
         tab_titles = [f"Scenario: {name}" for name, _ in all_results[:num_tabs]]
         tabs = st.tabs(tab_titles)
 
         for tab, (scenario_name, scenario_results) in zip(tabs, all_results[:num_tabs]):
             with tab:
-                summary_data = []
-                for result in scenario_results:
-                    output_df, selected_years, y_variable_name, model, anova_table, selected_x_vars, idx = result
-                    summary_data.append(['', 'Selected Years', ', '.join(map(str, selected_years))])
-                    summary_data.append(['', 'SUMMARY OUTPUT', ''])
-                    summary_data.append(['', 'Regression Statistics', ''])
-                    summary_data.append(['', 'Multiple R', f"{model.rsquared ** 0.5:.4f}"])
-                    summary_data.append([f"S{idx}R^2", 'R Square', f"{model.rsquared:.4f}"])
-                    summary_data.append(['', 'Adjusted R Square', f"{model.rsquared_adj:.4f}"])
-                    summary_data.append([f"S{idx}SE", 'Standard Error of the Regression', f"{model.scale ** 0.5:.4f}"])
-                    summary_data.append(['', 'Observations', f"{int(model.nobs)}"])
-                    summary_data.append(['', 'ANOVA', ''])
-                    summary_data.append(['', '', 'df', 'SS', 'MS', 'F', 'Significance F'])
-                    for index, row in anova_table.iterrows():
-                        summary_data.append(['', str(index)] + [str(item) if item is not None else '' for item in row.tolist()])
-
-                    coeff_table = pd.read_html(model.summary().tables[1].as_html(), header=0, index_col=0)[0].reset_index()
-                    summary_data.append(
-                        ['', '', 'Coefficients', 'Standard Error', 't Stat', 'P-value', 'Lower 95%', 'Upper 95%'])
-                    constant_row = coeff_table[coeff_table.iloc[:, 0] == 'const'].iloc[0].tolist()
-                    x_vars = coeff_table[coeff_table.iloc[:, 0] != 'const'].iloc[:, 0].tolist()
-                    x_vars_sorted = sorted(x_vars)
-                    summary_data.append([f"S{idx}Const"] + [str(item) if item is not None else '' for item in constant_row])
-                    for i, var in enumerate(x_vars_sorted, start=1):
-                        row = coeff_table[coeff_table.iloc[:, 0] == var].iloc[0].tolist()
-                        summary_data.append([f"S{idx}X{i}"] + [str(item) if item is not None else '' for item in row])
-
-                summary_df = pd.DataFrame(summary_data)
-                st.dataframe(summary_df)
+                summary_data = summary_rows.get(scenario_name)
+                if summary_data is None:
+                    summary_data = self._build_summary_rows(scenario_results)
+                # st.dataframe Arrow-serializes every cell on each rerun, so
+                # for very large outputs render a preview only; the full rows
+                # remain available through the clipboard/Excel paths below.
+                if len(summary_data) > 5000:
+                    st.dataframe(pd.DataFrame(summary_data[:200]))
+                    st.caption(f"Showing the first 200 of {len(summary_data)} rows; "
+                               "use the export buttons for the full output.")
+                else:
+                    st.dataframe(pd.DataFrame(summary_data))
                 if st.button(f"Copy to Clipboard {scenario_name}"):
-                    csv = summary_df.to_csv(sep='\t', index=False, header=False)
+                    csv = "\n".join(
+                        "\t".join('' if item is None else str(item) for item in row)
+                        for row in summary_data)
                     st.session_state[f"{scenario_name}_csv"] = csv
                     st.success("Data prepared for clipboard copying. Click the button below to copy.")
                     if st.button("Copy Now"):
                         st.write(f"Copy the data manually from here:\n\n{csv}\n")
 
                 if st.button(f"Export {scenario_name} as Excel"):
-                    self.export_excel(summary_df, scenario_name)
-
-    def export_excel(self, df, scenario_name):
-        excel_filename = f"{scenario_name}.xlsx"
-        sheet_name = "Sheet1"
-        with pd.ExcelWriter(excel_filename, engine='xlsxwriter') as writer:
-            df.to_excel(writer, sheet_name=sheet_name, index=False)
-        with open(excel_filename, 'rb') as f:
-            data = f.read()
-        st.download_button(label="Download Excel File", data=data, file_name=excel_filename)
-        os.remove(excel_filename)
-
-    def format_regression_output(self, model):
-        try:
-            summary_html = model.summary().tables[1].as_html()
-            summary_df = pd.read_html(summary_html, header=0, index_col=0)[0]
-            return summary_df
-        except Exception as e:
-            st.error("Failed to format regression output: " + str(e))
-            return pd.DataFrame()  # Return an empty DataFrame on failure
-
-    def calculate_anova_table(self, model):
-        sse = model.ssr
-        ssr = model.ess
-        sst = ssr + sse
-        dfe = model.df_resid
-        dfr = model.df_model
-        dft = dfr + dfe
-        mse = sse / dfe
-        msr = ssr / dfr
-        f_stat = msr / mse
-        p_value = model.f_pvalue
-        anova_table = pd.DataFrame({
-            'df': [dfr, dfe, dft],
-            'SS': [ssr, sse, sst],
-            'MS': [msr, mse, np.nan],
-            'F': [f_stat, np.nan, np.nan],
-            'Significance F': [f"{p_value:.4f}", np.nan, np.nan]
-        }, index=['Regression', 'Residual', 'Total'])
-        return anova_table
+                    self.export_excel(summary_data, scenario_name)
+
+    def export_excel(self, summary_data, scenario_name):
+        # The workbook was usually already built in the background while the
+        # other scenarios were still computing; fall back to building now.
+        data = st.session_state.get("xlsx_bytes", {}).get(scenario_name)
+        if data is None:
+            data = build_scenario_xlsx(summary_data)
+        st.download_button(label="Download Excel File", data=data,
+                           file_name=f"{scenario_name}.xlsx")
 
 def main():
     st.set_page_config(layout="wide")